@@ -4,47 +4,136 @@ Refactored for Vercel deployment
 """
 
 from flask import Flask, request, jsonify, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from openai import OpenAI
+import httpx
 import os
-import json
+import atexit
+import logging
+import logging.handlers
+import orjson
+import fastjsonschema
+import time
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
 from dotenv import load_dotenv
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
 
+# Resolved once at import; handlers read these instead of os.environ
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+AWS_REGION = os.getenv('AWS_DEFAULT_REGION', 'eu-north-1')
+API_KEY_STATUS = 'Configured' if OPENROUTER_API_KEY else 'Missing'
+# Serverless instances (Vercel, Lambda) are frozen as soon as they respond and
+# can be recycled at any time, so background threads are only safe elsewhere
+SERVERLESS = bool(os.getenv('VERCEL') or os.getenv('AWS_LAMBDA_FUNCTION_NAME'))
+
+# In a long-lived server, log records are handed to a background listener so
+# request threads never block on stderr writes. A frozen serverless instance
+# would hold them back, so there records are written directly.
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+if SERVERLESS:
+    logger.addHandler(_log_stream)
+else:
+    _log_queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+    _log_listener = logging.handlers.QueueListener(_log_queue, _log_stream)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson for jsonify"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode('utf-8')
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+def _json():
+    """Parse the request body straight from its bytes"""
+    return orjson.loads(request.get_data(cache=False))
+
+def _json_response(payload, status=200):
+    """Serialize a response without going through jsonify"""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
 # Explicitly allow all origins for API endpoints
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
+@app.before_request
+def _short_circuit_preflight():
+    """Answer CORS preflights before view dispatch; Flask-CORS adds the headers"""
+    # Unmatched URLs fall through so they still 404/405
+    if (request.method == 'OPTIONS' and request.url_rule is not None
+            and request.path.startswith('/api/')):
+        return '', 204
+
 # DynamoDB setup
 DYNAMODB_TABLE = "Contacts"
 dynamodb = None
 table = None
+# One pooled, keep-alive connection set shared by every handler thread
+DYNAMODB_CONFIG = Config(
+    max_pool_connections=128,
+    tcp_keepalive=True,
+    connect_timeout=2,
+    read_timeout=5,
+    retries={'mode': 'adaptive', 'max_attempts': 3}
+)
+# Shared by every request thread; only guards initialization
+_db_lock = threading.Lock()
+# After a failed initialization, callers skip DynamoDB for this long instead
+# of each retrying the slow failing load under the lock
+DYNAMODB_RETRY_INTERVAL = 30.0  # seconds
+_db_failed_at = None
+
+def _init_backing_off():
+    """True while a recent initialization failure is still being waited out"""
+    return _db_failed_at is not None and time.monotonic() - _db_failed_at < DYNAMODB_RETRY_INTERVAL
 
 def init_dynamodb():
-    """Initialize DynamoDB connection and table"""
-    global dynamodb, table
+    """Initialize DynamoDB connection and table on first use"""
+    if table is not None or _init_backing_off():
+        return
+    with _db_lock:
+        # Another thread may have finished or failed while we waited
+        if table is None and not _init_backing_off():
+            _init_dynamodb_locked()
+
+def _init_dynamodb_locked():
+    """Create the DynamoDB resource and load or create the table; caller holds _db_lock"""
+    global dynamodb, table, _db_failed_at
     try:
         if dynamodb is None:
             dynamodb = boto3.resource(
                 'dynamodb',
-                region_name=os.getenv('AWS_DEFAULT_REGION', 'eu-north-1'),
+                region_name=AWS_REGION,
                 aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                config=DYNAMODB_CONFIG
             )
         
         if table is None:
-            table = dynamodb.Table(DYNAMODB_TABLE)
+            tbl = dynamodb.Table(DYNAMODB_TABLE)
             try:
-                table.load()
-                print(f"DynamoDB table {DYNAMODB_TABLE} found")
+                tbl.load()
+                logger.info("DynamoDB table %s found", DYNAMODB_TABLE)
             except ClientError as e:
                 if e.response['Error']['Code'] == 'ResourceNotFoundException':
-                    print(f"Creating DynamoDB table {DYNAMODB_TABLE}...")
-                    table = dynamodb.create_table(
+                    logger.info("Creating DynamoDB table %s...", DYNAMODB_TABLE)
+                    tbl = dynamodb.create_table(
                         TableName=DYNAMODB_TABLE,
                         KeySchema=[
                             {'AttributeName': 'email', 'KeyType': 'HASH'},
@@ -54,28 +143,288 @@ def init_dynamodb():
                             {'AttributeName': 'email', 'AttributeType': 'S'},
                             {'AttributeName': 'timestamp', 'AttributeType': 'S'}
                         ],
-                        ProvisionedThroughput={
-                            'ReadCapacityUnits': 5,
-                            'WriteCapacityUnits': 5
-                        }
+                        # On-demand capacity so contact bursts aren't throttled at 5 WCU
+                        BillingMode='PAY_PER_REQUEST'
                     )
-                    table.wait_until_exists()
-                    print(f"DynamoDB table {DYNAMODB_TABLE} created successfully")
+                    tbl.wait_until_exists()
+                    logger.info("DynamoDB table %s created successfully", DYNAMODB_TABLE)
                 else:
                     raise e
+            # Publish only once the table is usable so other threads
+            # never skip the lock and see a half-initialized table
+            table = tbl
+            _db_failed_at = None
                     
-    except Exception as e:
-        print(f"DynamoDB initialization error: {e}")
+    except Exception:
+        _db_failed_at = time.monotonic()
+        logger.exception("DynamoDB initialization error (retrying in %ds)", DYNAMODB_RETRY_INTERVAL)
+
+# In a long-lived server, contact submissions are queued and written in
+# batches by a background thread, so /api/contact only pays for the enqueue.
+# Serverless instances write each submission before replying.
+# BatchWriteItem accepts at most 25 puts, so each drained batch is one call
+CONTACT_BATCH_SIZE = 25
+# How long a batch waits for more submissions after the first one arrives
+CONTACT_BATCH_WINDOW = 0.1  # seconds
+# A batch that keeps failing is retried this many times, then dropped
+CONTACT_MAX_ATTEMPTS = 5
+CONTACT_RETRY_DELAY = 1.0  # seconds
+# How long the exit drain waits for an in-flight batch to finish
+CONTACT_DRAIN_TIMEOUT = 5.0  # seconds
+_contact_queue = queue.Queue()
+_contact_stop = threading.Event()
+
+def _write_contacts(items):
+    """Write contacts with one batch writer"""
+    init_dynamodb()
+    if table is None:
+        raise Exception("DynamoDB table not initialized")
+    # A repeated key would make BatchWriteItem reject the whole batch
+    with table.batch_writer(overwrite_by_pkeys=['email', 'timestamp']) as writer:
+        for item in items:
+            writer.put_item(Item=item)
+
+def _contact_writer():
+    """Drain queued contacts and write them in batches until told to stop"""
+    while not _contact_stop.is_set():
+        try:
+            items = [_contact_queue.get(timeout=CONTACT_BATCH_WINDOW)]
+        except queue.Empty:
+            continue
+        deadline = time.monotonic() + CONTACT_BATCH_WINDOW
+        while len(items) < CONTACT_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(_contact_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        for attempt in range(1, CONTACT_MAX_ATTEMPTS + 1):
+            try:
+                _write_contacts(items)
+                break
+            except Exception:
+                if attempt == CONTACT_MAX_ATTEMPTS:
+                    logger.exception("Contact write failed %d times, dropping %d items: %r",
+                                     attempt, len(items), items)
+                    break
+                logger.exception("Contact write error (%d items, attempt %d of %d)",
+                                 len(items), attempt, CONTACT_MAX_ATTEMPTS)
+                if _contact_stop.wait(CONTACT_RETRY_DELAY):
+                    # Shutting down; hand the batch to the exit drain
+                    for item in items:
+                        _contact_queue.put(item)
+                    break
+
+def _drain_contacts():
+    """Stop the writer, then write whatever is still queued before the process exits"""
+    _contact_stop.set()
+    _contact_writer_thread.join(timeout=CONTACT_DRAIN_TIMEOUT)
+    items = []
+    while True:
+        try:
+            items.append(_contact_queue.get_nowait())
+        except queue.Empty:
+            break
+    if not items:
+        return
+    try:
+        _write_contacts(items)
+    except Exception:
+        logger.exception("Contact write error on shutdown, dropping %d items: %r", len(items), items)
+
+_contact_writer_thread = threading.Thread(target=_contact_writer, name='contact-writer', daemon=True)
+if not SERVERLESS:
+    _contact_writer_thread.start()
+    atexit.register(_drain_contacts)
 
-# Initialize DynamoDB on startup
-init_dynamodb()
+# In a long-lived server, page visits are counted in-process and flushed as
+# one aggregated increment, so /api/track-visit never waits on DynamoDB.
+# Serverless instances add each visit before replying.
+VISIT_FLUSH_INTERVAL = 1.0  # seconds
+# The counter is read and written through the low-level client with
+# pre-serialized attribute values, skipping the resource layer's marshaling
+_VISITS_KEY = {
+    'email': {'S': 'analytics'},
+    'timestamp': {'S': 'total_visits'}
+}
+_pending_visits = 0
+_visits_lock = threading.Lock()
+# /api/analytics serves (total_visits, expires_at) until it expires or a
+# flush changes the stored total
+ANALYTICS_CACHE_TTL = 1.5  # seconds
+_analytics_cache = (0, 0.0)
+
+def _add_visits(delta):
+    """Add delta to the stored visit total"""
+    global _analytics_cache
+    init_dynamodb()
+    if table is None:
+        raise Exception("DynamoDB table not initialized")
+    # if_not_exists seeds the counter on first visit
+    dynamodb.meta.client.update_item(
+        TableName=DYNAMODB_TABLE,
+        Key=_VISITS_KEY,
+        UpdateExpression='SET visit_count = if_not_exists(visit_count, :zero) + :inc',
+        ExpressionAttributeValues={
+            ':inc': {'N': str(delta)},
+            ':zero': {'N': '0'}
+        }
+    )
+    _analytics_cache = (0, 0.0)
+
+def _flush_visits():
+    """Write the buffered visit count; failed deltas are kept for the next flush"""
+    global _pending_visits
+    with _visits_lock:
+        delta, _pending_visits = _pending_visits, 0
+    if not delta:
+        return
+
+    try:
+        _add_visits(delta)
+    except Exception:
+        logger.exception("Visit flush error (%d visits kept)", delta)
+        with _visits_lock:
+            _pending_visits += delta
+
+def _visit_flusher():
+    """Periodically add the buffered visit count to the stored total"""
+    while True:
+        time.sleep(VISIT_FLUSH_INTERVAL)
+        _flush_visits()
 
-# Initialize OpenAI client with OpenRouter
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY")
+if not SERVERLESS:
+    threading.Thread(target=_visit_flusher, name='visit-flusher', daemon=True).start()
+    atexit.register(_flush_visits)
+
+# OpenRouter is called over raw HTTP so streamed chunks are parsed straight
+# from the SSE bytes instead of being built into SDK objects. The client keeps
+# one pooled keep-alive connection set for the whole process.
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_HEADERS = {
+    'Authorization': f'Bearer {OPENROUTER_API_KEY}',
+    'Content-Type': 'application/json'
+}
+# The transport's retries only cover failed connection attempts; unlike the
+# OpenAI SDK, 429 and 5xx responses are not retried and surface as errors.
+openrouter = httpx.Client(
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_connections=128, max_keepalive_connections=64, keepalive_expiry=60)
+    ),
+    timeout=httpx.Timeout(60.0, connect=3.05)
 )
 
+CHAT_MODEL = "openai/gpt-oss-20b:free"
+
+# Exact-match response cache keyed by the full prompt
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+LLM_CACHE_MAX_ENTRIES = 1024
+LLM_CACHE_TTL = 4 * 60 * 60  # seconds
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+def _normalize_prompt(text):
+    """Trim outer whitespace and trailing punctuation so trivial variants share a key"""
+    # Case and inner whitespace are kept: code questions differ by identifier
+    # case and indentation
+    return text.strip().rstrip('?!.')
+
+def _cache_key(messages):
+    """Hash the model and prompt into a stable cache key"""
+    *history, latest = messages
+    latest = {**latest, 'content': _normalize_prompt(latest['content'])}
+    payload = orjson.dumps({'model': CHAT_MODEL, 'messages': [*history, latest]},
+                           option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+def _cache_get(key):
+    """Return a cached response, or None if missing or expired"""
+    with _response_cache_lock:
+        entry = _response_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, content = entry
+        if time.monotonic() - stored_at > LLM_CACHE_TTL:
+            del _response_cache[key]
+            return None
+        _response_cache.move_to_end(key)
+        return content
+
+def _cache_put(key, content):
+    """Store a response, evicting the least recently used entries"""
+    with _response_cache_lock:
+        _response_cache[key] = (time.monotonic(), content)
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > LLM_CACHE_MAX_ENTRIES:
+            _response_cache.popitem(last=False)
+
+# Request bodies are checked by compiled validators before any other work
+_validate_chat = fastjsonschema.compile({
+    'type': 'object',
+    'required': ['message'],
+    'properties': {
+        'message': {'type': 'string', 'pattern': r'\S', 'maxLength': 20000},
+        'conversationHistory': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'required': ['role', 'content'],
+                'properties': {
+                    'role': {'type': 'string'},
+                    'content': {'type': 'string'}
+                }
+            }
+        }
+    }
+})
+
+_validate_contact = fastjsonschema.compile({
+    'type': 'object',
+    'required': ['name', 'email', 'message'],
+    'properties': {
+        'name': {'type': 'string', 'pattern': r'\S', 'maxLength': 200},
+        'email': {'type': 'string', 'pattern': r'\S', 'format': 'email', 'maxLength': 320},
+        'message': {'type': 'string', 'pattern': r'\S', 'maxLength': 10000}
+    }
+})
+
+def _validation_error(e, missing_message, fields):
+    """Turn a schema failure into the endpoint's 400 response"""
+    # Missing and blank top-level fields keep the endpoint's own wording;
+    # anything else, including nested failures, reports the validator's message
+    missing = e.rule == 'required' and e.name == 'data'
+    blank = e.rule == 'pattern' and e.name in {f'data.{field}' for field in fields}
+    error = missing_message if missing or blank else e.message
+    return jsonify({'success': False, 'error': error}), 400
+
+# Upstream cost and latency grow with prompt length, so only recent turns are sent
+MAX_HISTORY_TURNS = 12
+MAX_HISTORY_CHARS = 16000
+
+def _trim_history(history):
+    """Keep the most recent turns that fit within the history budget"""
+    history = history[-MAX_HISTORY_TURNS:]
+    total = sum(len(m.get('content', '')) for m in history)
+    start = 0
+    while total > MAX_HISTORY_CHARS:
+        total -= len(history[start].get('content', ''))
+        start += 1
+    return history[start:]
+
+# Fixed parts of the per-token SSE frames, so only the content is encoded per chunk
+_SSE_PREFIX = b'data: {"content":'
+_SSE_MID_FALSE = b',"done":false}\n\n'
+_SSE_DONE = b'data: {"content":"","done":true}\n\n'
+
+def _sse_event(payload):
+    """Encode one Server-Sent Events data frame"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
 # System message for the assistant
 SYSTEM_MESSAGE = {
     "role": "system",
@@ -85,115 +434,150 @@ SYSTEM_MESSAGE = {
 @app.route('/api/chat', methods=['POST', 'OPTIONS'])
 def chat_stream():
     """Streaming chat endpoint with GPT-4o"""
-    if request.method == 'OPTIONS':
-        return jsonify({'status': 'ok'}), 200
-
     try:
-        data = request.json
-        message = data.get('message', '').strip()
-        conversation_history = data.get('conversationHistory', [])
-        
-        if not message:
-            return jsonify({'success': False, 'error': 'Message is required'}), 400
+        try:
+            data = _json()
+        except orjson.JSONDecodeError:
+            return jsonify({'success': False, 'error': 'Invalid JSON body'}), 400
+        try:
+            _validate_chat(data)
+        except fastjsonschema.JsonSchemaException as e:
+            return _validation_error(e, 'Message is required', ('message',))
+
+        message = data['message'].strip()
+        conversation_history = _trim_history(data.get('conversationHistory', []))
         
         # Build messages array
-        messages = [SYSTEM_MESSAGE] + conversation_history + [
-            {"role": "user", "content": message}
-        ]
+        messages = [SYSTEM_MESSAGE, *conversation_history, {"role": "user", "content": message}]
         
+        cache_key = _cache_key(messages) if LLM_CACHE_ENABLED else None
+
         def generate():
             try:
+                cached = _cache_get(cache_key) if cache_key else None
+                if cached is not None:
+                    yield _SSE_PREFIX + orjson.dumps(cached) + _SSE_MID_FALSE
+                    yield _SSE_DONE
+                    return
+
                 # Stream the response with GPT-4o
-                stream = client.chat.completions.create(
-                    model="openai/gpt-oss-20b:free",
-                    messages=messages,
-                    stream=True
-                )
-                
-                for chunk in stream:
-                    if chunk.choices[0].delta.content:
-                        content = chunk.choices[0].delta.content
-                        yield f"data: {json.dumps({'content': content, 'done': False})}\n\n"
+                body = orjson.dumps({'model': CHAT_MODEL, 'messages': messages, 'stream': True})
+                parts = []
+                done = False
+                finish_reason = None
+                with openrouter.stream('POST', OPENROUTER_URL, headers=OPENROUTER_HEADERS,
+                                       content=body) as upstream:
+                    if upstream.is_error:
+                        upstream.read()
+                        raise Exception(f"OpenRouter error {upstream.status_code}: {upstream.text}")
+
+                    for line in upstream.iter_lines():
+                        # Skip blank separators and ': keep-alive' comments
+                        if not line.startswith('data: '):
+                            continue
+                        payload = line[6:]
+                        if payload == '[DONE]':
+                            done = True
+                            break
+
+                        chunk = orjson.loads(payload)
+                        if 'error' in chunk:
+                            err = chunk['error']
+                            raise Exception(err.get('message', 'OpenRouter stream error') if isinstance(err, dict) else str(err))
+                        choices = chunk.get('choices')
+                        if not choices:
+                            continue
+                        finish_reason = choices[0].get('finish_reason') or finish_reason
+                        # Finish-only choices may carry no delta at all
+                        content = (choices[0].get('delta') or {}).get('content')
+                        if content:
+                            parts.append(content)
+                            yield _SSE_PREFIX + orjson.dumps(content) + _SSE_MID_FALSE
                 
+                # Only responses that ended normally are cached; a stream cut
+                # off before [DONE] or stopped for length/filtering is partial
+                if cache_key and parts and done and finish_reason == 'stop':
+                    _cache_put(cache_key, ''.join(parts))
+
                 # Send completion signal
-                yield f"data: {json.dumps({'content': '', 'done': True})}\n\n"
+                yield _SSE_DONE
                 
             except Exception as e:
-                print(f"Streaming error: {e}")
-                yield f"data: {json.dumps({'error': str(e), 'done': True})}\n\n"
+                logger.exception("Streaming error")
+                yield _sse_event({'error': str(e), 'done': True})
         
         return Response(
             stream_with_context(generate()),
             mimetype='text/event-stream',
             headers={
                 'Cache-Control': 'no-cache',
-                'X-Accel-Buffering': 'no'
+                'X-Accel-Buffering': 'no',
+                # Compressing proxies buffer the stream; keep it uncompressed
+                'Content-Encoding': 'identity'
             }
         )
         
     except Exception as e:
-        print(f"Chat API Error: {e}")
+        logger.exception("Chat API Error")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/contact', methods=['POST', 'OPTIONS'])
 def save_contact():
     """Save contact form submission to database"""
-    if request.method == 'OPTIONS':
-        return jsonify({'status': 'ok'}), 200
-
     try:
-        data = request.json
-        name = data.get('name', '').strip()
-        email = data.get('email', '').strip()
-        message = data.get('message', '').strip()
-        
-        if not all([name, email, message]):
-            return jsonify({'success': False, 'error': 'All fields are required'}), 400
+        try:
+            data = _json()
+        except orjson.JSONDecodeError:
+            return jsonify({'success': False, 'error': 'Invalid JSON body'}), 400
+        try:
+            _validate_contact(data)
+        except fastjsonschema.JsonSchemaException as e:
+            return _validation_error(e, 'All fields are required', ('name', 'email', 'message'))
+
+        name = data['name'].strip()
+        email = data['email'].strip()
+        message = data['message'].strip()
             
-        from datetime import datetime
         timestamp = datetime.utcnow().isoformat()
         
         init_dynamodb()
-        if table:
-            table.put_item(
-                Item={
-                    'name': name,
-                    'email': email,
-                    'message': message,
-                    'timestamp': timestamp
-                }
-            )
+        if table is None:
+            raise Exception("DynamoDB table not initialized")
+
+        item = {
+            'name': name,
+            'email': email,
+            'message': message,
+            'timestamp': timestamp
+        }
+        if SERVERLESS:
+            table.put_item(Item=item)
         else:
-             raise Exception("DynamoDB table not initialized")
+            _contact_queue.put(item)
         
         return jsonify({'success': True, 'message': 'Message sent successfully'})
         
     except Exception as e:
-        print(f"Contact API Error: {e}")
+        logger.exception("Contact API Error")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    api_key_status = 'Configured' if os.getenv('OPENROUTER_API_KEY') else 'Missing'
-    
-    # Check DB connection
-    db_status = 'Error'
-    try:
-        init_dynamodb()
-        if table:
-            # Lightweight check
-            table.load()
-            db_status = 'Connected'
-        else:
-            db_status = 'Not Initialized'
-    except:
-        pass
+    # A no-op once the table is published, and rate-limited after a failure,
+    # so at most one probe per retry interval reaches DynamoDB
+    init_dynamodb()
+    if table is not None:
+        db_status = 'Connected'
+    elif _db_failed_at is not None:
+        db_status = 'Error'
+    else:
+        db_status = 'Not Initialized'
         
-    return jsonify({
+    return _json_response({
         'status': 'OK',
         'message': 'Chat API is running',
-        'api_key': api_key_status,
+        'api_key': API_KEY_STATUS,
         'database': db_status
     })
 
@@ -215,63 +599,48 @@ def index():
 @app.route('/api/track-visit', methods=['POST', 'OPTIONS'])
 def track_visit():
     """Track a page visit"""
-    if request.method == 'OPTIONS':
-        return jsonify({'status': 'ok'}), 200
-        
-    try:
-        init_dynamodb()
-        if table is None:
-            raise Exception("DynamoDB table not initialized")
-
-        # Atomic counter update
-        table.update_item(
-            Key={
-                'email': 'analytics',
-                'timestamp': 'total_visits'
-            },
-            UpdateExpression='ADD visit_count :inc',
-            ExpressionAttributeValues={
-                ':inc': 1
-            }
-        )
-        
-        return jsonify({'success': True})
-    except Exception as e:
-        print(f"Tracking Error: {e}")
-        # If item doesn't exist, create it
+    global _pending_visits
+    if SERVERLESS:
         try:
-            table.put_item(
-                Item={
-                    'email': 'analytics',
-                    'timestamp': 'total_visits',
-                    'visit_count': 1
-                }
-            )
-            return jsonify({'success': True})
-        except Exception as inner_e:
-            return jsonify({'success': False, 'error': str(inner_e)}), 500
+            _add_visits(1)
+        except Exception as e:
+            logger.exception("Tracking Error")
+            return _json_response({'success': False, 'error': str(e)}, status=500)
+        return _json_response({'success': True})
+
+    with _visits_lock:
+        _pending_visits += 1
+    return _json_response({'success': True})
 
 @app.route('/api/analytics', methods=['GET', 'OPTIONS'])
 def get_analytics():
     """Get analytics data"""
-    if request.method == 'OPTIONS':
-        return jsonify({'status': 'ok'}), 200
+    global _analytics_cache
+    visit_count, expires_at = _analytics_cache
+    now = time.monotonic()
+    if now < expires_at:
+        return jsonify({
+            'success': True,
+            'data': {
+                'total_visits': visit_count
+            }
+        })
 
     try:
         init_dynamodb()
         if table is None:
             raise Exception("DynamoDB table not initialized")
         
-        response = table.get_item(
-            Key={
-                'email': 'analytics',
-                'timestamp': 'total_visits'
-            }
+        response = dynamodb.meta.client.get_item(
+            TableName=DYNAMODB_TABLE,
+            Key=_VISITS_KEY,
+            ProjectionExpression='visit_count'
         )
         
         visit_count = 0
         if 'Item' in response:
-            visit_count = int(response['Item'].get('visit_count', 0))
+            visit_count = int(response['Item'].get('visit_count', {}).get('N', 0))
+        _analytics_cache = (visit_count, now + ANALYTICS_CACHE_TTL)
             
         return jsonify({
             'success': True,
@@ -280,11 +649,16 @@ def get_analytics():
             }
         })
     except Exception as e:
-        print(f"Analytics Error: {e}")
+        logger.exception("Analytics Error")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Local development server only; self-hosted deployments run the app under
+# gunicorn's gevent workers (see Procfile), which patch sockets on startup
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     print(f"Chat API running on port {port}")
-    print(f"OpenRouter API Key: {'Configured' if os.getenv('OPENROUTER_API_KEY') else 'Missing'}")
-    app.run(host='0.0.0.0', port=port, debug=True)
+    print(f"OpenRouter API Key: {API_KEY_STATUS}")
+    # The Werkzeug debugger allows remote code execution when bound to 0.0.0.0,
+    # so it is only enabled on request with FLASK_DEBUG=1
+    debug = os.getenv('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes')
+    app.run(host='0.0.0.0', port=port, debug=debug)